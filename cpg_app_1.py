@@ -2,8 +2,11 @@
 """Single-file CPG marketing content generator.
 
 Run:
-  pip install streamlit
+  pip install streamlit requests  # optional: pcre2 orjson msgspec numba
   streamlit run cpg_app.py
+
+Test:
+  pip install pytest && python -m pytest -q
 """
 
 from __future__ import annotations
@@ -14,13 +17,52 @@ import io
 import json
 import os
 import re
-import urllib.error
-import urllib.request
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from functools import cache, lru_cache, partial
 from pathlib import Path
-from typing import Any
+from textwrap import indent
+from types import MappingProxyType
+from typing import Any, Callable, Iterator
 
+import requests
 import streamlit as st
 
+try:
+    import pcre2
+except ImportError:  # optional: JIT-compiled PCRE2 for the compliance scan
+    pcre2 = None
+
+try:
+    import msgspec
+except ImportError:  # optional: typed decoding of streamed completion chunks
+    msgspec = None
+
+try:
+    import numba
+    import numpy as np
+except ImportError:  # optional: JIT-compiled batch compliance scanner
+    numba = None
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON encode/decode
+    orjson = None
+
+
+def json_dumps(obj: Any, *, pretty: bool = False, sort_keys: bool = False) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes; pretty indents nested values by two spaces."""
+    if orjson is not None:
+        option = (orjson.OPT_INDENT_2 if pretty else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if pretty else None, sort_keys=sort_keys).encode("utf-8")
+
+
+def json_loads(data: bytes | str) -> Any:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either.
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 
 def load_env_file(path: Path) -> None:
     if not path.exists():
@@ -41,129 +83,186 @@ load_env_file(ROOT / ".env")
 load_env_file(ROOT / "cpg-app" / ".env")
 
 
-PRODUCT_DATABASE = [
-    {
-        "id": "p1",
-        "name": "PureGlow Vitamin C Serum",
-        "category": "Skincare",
-        "brand": "PureGlow Naturals",
-        "features": ["30% Vitamin C", "Hyaluronic Acid", "Ferulic Acid", "Vegan", "Cruelty-free"],
-        "benefits": ["Brightens skin tone", "Reduces dark spots", "Boosts collagen production", "Deep hydration"],
-        "usage": "Apply 3-4 drops to clean face morning and evening. Follow with moisturizer and SPF.",
-        "targetAudience": "Women 25-45, skincare enthusiasts, clean beauty advocates",
-        "pricePoint": "$34.99",
-        "usp": "Clinical-grade Vitamin C in a clean, sustainable formula",
-    },
-    {
-        "id": "p2",
-        "name": "FreshBite Protein Crunch Bars",
-        "category": "Food & Beverage",
-        "brand": "FreshBite Co.",
-        "features": ["20g protein", "Gluten-free", "No artificial sweeteners", "Non-GMO", "5g fiber"],
-        "benefits": ["Sustained energy", "Muscle recovery support", "Guilt-free snacking", "Keeps you full longer"],
-        "usage": "Enjoy as a post-workout snack or mid-day energy boost. Best served chilled.",
-        "targetAudience": "Fitness enthusiasts 18-40, health-conscious consumers, busy professionals",
-        "pricePoint": "$2.99/bar",
-        "usp": "Real food ingredients with macro-friendly nutrition",
-    },
-    {
-        "id": "p3",
-        "name": "EcoClean All-Purpose Spray",
-        "category": "Household",
-        "brand": "EcoClean Home",
-        "features": ["Plant-based formula", "Biodegradable", "No harsh chemicals", "Recyclable packaging", "EPA Safer Choice certified"],
-        "benefits": ["Cuts grease effectively", "Safe around kids and pets", "Fresh lavender scent", "Streak-free clean"],
-        "usage": "Spray directly on surfaces. Wipe with cloth. No rinsing needed.",
-        "targetAudience": "Eco-conscious families, parents with young children, sustainability advocates",
-        "pricePoint": "$6.49",
-        "usp": "Powerful cleaning without compromising your family's health or the planet",
-    },
-    {
-        "id": "p4",
-        "name": "ZenBrew Adaptogenic Coffee",
-        "category": "Food & Beverage",
-        "brand": "ZenBrew",
-        "features": ["Organic Arabica", "Lion's Mane mushroom", "Ashwagandha", "L-Theanine", "Medium roast"],
-        "benefits": ["Calm focus without jitters", "Enhanced cognitive function", "Stress reduction", "Smooth, rich flavor"],
-        "usage": "Brew 2 tbsp per 6oz water. French press or drip recommended. Enjoy hot or iced.",
-        "targetAudience": "Wellness-focused professionals 25-50, biohackers, mindful consumers",
-        "pricePoint": "$24.99/bag",
-        "usp": "Where ancient adaptogens meet artisan coffee",
-    },
-    {
-        "id": "p5",
-        "name": "LuxeLocks Keratin Repair Mask",
-        "category": "Haircare",
-        "brand": "LuxeLocks Paris",
-        "features": ["Keratin complex", "Argan oil", "Silk proteins", "Color-safe", "Sulfate-free"],
-        "benefits": ["Repairs damage in one use", "72-hour frizz control", "Salon-quality results at home", "Restores shine and elasticity"],
-        "usage": "Apply generously to damp hair. Leave for 5-10 minutes. Rinse thoroughly. Use weekly.",
-        "targetAudience": "Women 20-50 with color-treated or damaged hair, salon quality seekers",
-        "pricePoint": "$18.99",
-        "usp": "Parisian salon science in every jar",
-    },
-    {
-        "id": "p6",
-        "name": "TinyTots Organic Baby Wipes",
-        "category": "Baby Care",
-        "brand": "TinyTots",
-        "features": ["99% water", "Organic cotton", "Hypoallergenic", "Fragrance-free", "Compostable"],
-        "benefits": ["Gentle on sensitive skin", "No irritation or rashes", "Eco-friendly disposal", "Pediatrician recommended"],
-        "usage": "Gently wipe and dispose. Safe for face, hands, and diaper area.",
-        "targetAudience": "New parents, eco-conscious families, parents of babies with sensitive skin",
-        "pricePoint": "$8.99/80ct",
-        "usp": "Pure enough for the most precious skin on earth",
-    },
-]
+@dataclass(frozen=True, slots=True)
+class Product:
+    id: str
+    name: str
+    category: str
+    brand: str
+    features: tuple[str, ...]
+    benefits: tuple[str, ...]
+    usage: str
+    targetAudience: str
+    pricePoint: str
+    usp: str
+    # "Name (Brand)" display label, computed once instead of on every rerun.
+    label: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "label", f"{self.name} ({self.brand})")
+
 
+@dataclass(frozen=True, slots=True)
+class BrandGuide:
+    tone: str
+    voiceTraits: tuple[str, ...]
+    doWords: tuple[str, ...]
+    dontWords: tuple[str, ...]
+    tagline: str
 
-BRAND_STYLE_GUIDES = {
-    "PureGlow Naturals": {
-        "tone": "Sophisticated, science-backed yet approachable, empowering",
-        "voiceTraits": ["Clean", "Confident", "Educational", "Aspirational"],
-        "doWords": ["radiance", "transform", "clinical-grade", "pure", "glow", "reveal"],
-        "dontWords": ["cheap", "miracle", "cure", "guaranteed results", "anti-aging"],
-        "tagline": "Science Meets Nature",
-    },
-    "FreshBite Co.": {
-        "tone": "Energetic, fun, motivational, straightforward",
-        "voiceTraits": ["Bold", "Active", "Real", "Community-driven"],
-        "doWords": ["fuel", "crush it", "real food", "power", "clean", "strong"],
-        "dontWords": ["diet", "low-cal", "skinny", "cheat meal", "guilt"],
-        "tagline": "Fuel Your Fire",
-    },
-    "EcoClean Home": {
-        "tone": "Warm, trustworthy, eco-conscious, family-friendly",
-        "voiceTraits": ["Caring", "Transparent", "Sustainable", "Reliable"],
-        "doWords": ["protect", "pure", "planet-friendly", "safe", "naturally", "home"],
-        "dontWords": ["toxic", "chemical-free (misleading)", "100% safe", "kills all"],
-        "tagline": "Clean Home, Clean Planet",
-    },
-    "ZenBrew": {
-        "tone": "Mindful, premium, intellectual, calm confidence",
-        "voiceTraits": ["Wise", "Serene", "Elevated", "Intentional"],
-        "doWords": ["ritual", "clarity", "flow state", "craft", "mindful", "elevate"],
-        "dontWords": ["wired", "buzzed", "caffeine hit", "basic", "average"],
-        "tagline": "Clarity in Every Cup",
-    },
-    "LuxeLocks Paris": {
-        "tone": "Luxurious, French-inspired elegance, expert authority",
-        "voiceTraits": ["Glamorous", "Expert", "Indulgent", "Confident"],
-        "doWords": ["luxe", "transform", "salon-grade", "nourish", "silk", "radiant"],
-        "dontWords": ["cheap", "basic", "quick fix", "drugstore", "no-fuss"],
-        "tagline": "L'Art du Cheveu",
-    },
-    "TinyTots": {
-        "tone": "Tender, reassuring, pure, parent-to-parent",
-        "voiceTraits": ["Gentle", "Trustworthy", "Pure", "Loving"],
-        "doWords": ["gentle", "pure", "precious", "nurture", "safe", "soft"],
-        "dontWords": ["tough", "strong", "powerful", "aggressive", "extreme"],
-        "tagline": "Pure Love, Pure Care",
-    },
+
+PRODUCT_DATABASE = (
+    Product(
+        id="p1",
+        name="PureGlow Vitamin C Serum",
+        category="Skincare",
+        brand="PureGlow Naturals",
+        features=("30% Vitamin C", "Hyaluronic Acid", "Ferulic Acid", "Vegan", "Cruelty-free"),
+        benefits=("Brightens skin tone", "Reduces dark spots", "Boosts collagen production", "Deep hydration"),
+        usage="Apply 3-4 drops to clean face morning and evening. Follow with moisturizer and SPF.",
+        targetAudience="Women 25-45, skincare enthusiasts, clean beauty advocates",
+        pricePoint="$34.99",
+        usp="Clinical-grade Vitamin C in a clean, sustainable formula",
+    ),
+    Product(
+        id="p2",
+        name="FreshBite Protein Crunch Bars",
+        category="Food & Beverage",
+        brand="FreshBite Co.",
+        features=("20g protein", "Gluten-free", "No artificial sweeteners", "Non-GMO", "5g fiber"),
+        benefits=("Sustained energy", "Muscle recovery support", "Guilt-free snacking", "Keeps you full longer"),
+        usage="Enjoy as a post-workout snack or mid-day energy boost. Best served chilled.",
+        targetAudience="Fitness enthusiasts 18-40, health-conscious consumers, busy professionals",
+        pricePoint="$2.99/bar",
+        usp="Real food ingredients with macro-friendly nutrition",
+    ),
+    Product(
+        id="p3",
+        name="EcoClean All-Purpose Spray",
+        category="Household",
+        brand="EcoClean Home",
+        features=("Plant-based formula", "Biodegradable", "No harsh chemicals", "Recyclable packaging", "EPA Safer Choice certified"),
+        benefits=("Cuts grease effectively", "Safe around kids and pets", "Fresh lavender scent", "Streak-free clean"),
+        usage="Spray directly on surfaces. Wipe with cloth. No rinsing needed.",
+        targetAudience="Eco-conscious families, parents with young children, sustainability advocates",
+        pricePoint="$6.49",
+        usp="Powerful cleaning without compromising your family's health or the planet",
+    ),
+    Product(
+        id="p4",
+        name="ZenBrew Adaptogenic Coffee",
+        category="Food & Beverage",
+        brand="ZenBrew",
+        features=("Organic Arabica", "Lion's Mane mushroom", "Ashwagandha", "L-Theanine", "Medium roast"),
+        benefits=("Calm focus without jitters", "Enhanced cognitive function", "Stress reduction", "Smooth, rich flavor"),
+        usage="Brew 2 tbsp per 6oz water. French press or drip recommended. Enjoy hot or iced.",
+        targetAudience="Wellness-focused professionals 25-50, biohackers, mindful consumers",
+        pricePoint="$24.99/bag",
+        usp="Where ancient adaptogens meet artisan coffee",
+    ),
+    Product(
+        id="p5",
+        name="LuxeLocks Keratin Repair Mask",
+        category="Haircare",
+        brand="LuxeLocks Paris",
+        features=("Keratin complex", "Argan oil", "Silk proteins", "Color-safe", "Sulfate-free"),
+        benefits=("Repairs damage in one use", "72-hour frizz control", "Salon-quality results at home", "Restores shine and elasticity"),
+        usage="Apply generously to damp hair. Leave for 5-10 minutes. Rinse thoroughly. Use weekly.",
+        targetAudience="Women 20-50 with color-treated or damaged hair, salon quality seekers",
+        pricePoint="$18.99",
+        usp="Parisian salon science in every jar",
+    ),
+    Product(
+        id="p6",
+        name="TinyTots Organic Baby Wipes",
+        category="Baby Care",
+        brand="TinyTots",
+        features=("99% water", "Organic cotton", "Hypoallergenic", "Fragrance-free", "Compostable"),
+        benefits=("Gentle on sensitive skin", "No irritation or rashes", "Eco-friendly disposal", "Pediatrician recommended"),
+        usage="Gently wipe and dispose. Safe for face, hands, and diaper area.",
+        targetAudience="New parents, eco-conscious families, parents of babies with sensitive skin",
+        pricePoint="$8.99/80ct",
+        usp="Pure enough for the most precious skin on earth",
+    ),
+)
+
+
+BRAND_STYLE_GUIDES: dict[str, BrandGuide] = {
+    "PureGlow Naturals": BrandGuide(
+        tone="Sophisticated, science-backed yet approachable, empowering",
+        voiceTraits=("Clean", "Confident", "Educational", "Aspirational"),
+        doWords=("radiance", "transform", "clinical-grade", "pure", "glow", "reveal"),
+        dontWords=("cheap", "miracle", "cure", "guaranteed results", "anti-aging"),
+        tagline="Science Meets Nature",
+    ),
+    "FreshBite Co.": BrandGuide(
+        tone="Energetic, fun, motivational, straightforward",
+        voiceTraits=("Bold", "Active", "Real", "Community-driven"),
+        doWords=("fuel", "crush it", "real food", "power", "clean", "strong"),
+        dontWords=("diet", "low-cal", "skinny", "cheat meal", "guilt"),
+        tagline="Fuel Your Fire",
+    ),
+    "EcoClean Home": BrandGuide(
+        tone="Warm, trustworthy, eco-conscious, family-friendly",
+        voiceTraits=("Caring", "Transparent", "Sustainable", "Reliable"),
+        doWords=("protect", "pure", "planet-friendly", "safe", "naturally", "home"),
+        dontWords=("toxic", "chemical-free (misleading)", "100% safe", "kills all"),
+        tagline="Clean Home, Clean Planet",
+    ),
+    "ZenBrew": BrandGuide(
+        tone="Mindful, premium, intellectual, calm confidence",
+        voiceTraits=("Wise", "Serene", "Elevated", "Intentional"),
+        doWords=("ritual", "clarity", "flow state", "craft", "mindful", "elevate"),
+        dontWords=("wired", "buzzed", "caffeine hit", "basic", "average"),
+        tagline="Clarity in Every Cup",
+    ),
+    "LuxeLocks Paris": BrandGuide(
+        tone="Luxurious, French-inspired elegance, expert authority",
+        voiceTraits=("Glamorous", "Expert", "Indulgent", "Confident"),
+        doWords=("luxe", "transform", "salon-grade", "nourish", "silk", "radiant"),
+        dontWords=("cheap", "basic", "quick fix", "drugstore", "no-fuss"),
+        tagline="L'Art du Cheveu",
+    ),
+    "TinyTots": BrandGuide(
+        tone="Tender, reassuring, pure, parent-to-parent",
+        voiceTraits=("Gentle", "Trustworthy", "Pure", "Loving"),
+        doWords=("gentle", "pure", "precious", "nurture", "safe", "soft"),
+        dontWords=("tough", "strong", "powerful", "aggressive", "extreme"),
+        tagline="Pure Love, Pure Care",
+    ),
 }
 
 
-def build_rules() -> dict[str, list[dict[str, Any]]]:
+def compile_rule_pattern(pattern: str) -> Any:
+    """Compile a compliance pattern, preferring PCRE2's JIT when it is installed.
+
+    Both engines expose the same finditer/lastgroup API used by check_compliance.
+    Patterns are lowercase and matched against lowercased text (see _scan_lowered),
+    so no case-insensitive flag is needed.
+    """
+    if pcre2 is not None:
+        try:
+            return pcre2.compile(pattern, jit=True)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+def _scan_lowered(regex: Any, text: str) -> Iterator[Any]:
+    """finditer of a lowercase pattern over text.lower(); offsets index into text.
+
+    Unlike re.IGNORECASE, lower() leaves the dotless "ı" and long "ſ" as they are,
+    so those no longer stand in for "i" and "s": "100% ſafe" is not reported.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return regex.finditer(lowered)
+    # lower() changed the length (e.g. "İ" -> "i̇"), so offsets would drift; match
+    # the original text case-insensitively instead.
+    return re.finditer(regex.pattern, text, re.IGNORECASE)
+
+
+def build_rules() -> dict[str, dict[str, Any]]:
     raw_rules = {
         "Skincare": [
             ("No disease treatment claims", "critical", r"\b(cure|treat|heal|remedy)\b"),
@@ -182,7 +281,7 @@ def build_rules() -> dict[str, list[dict[str, Any]]]:
         "Household": [
             ("No absolute safety claims", "critical", r"\b(100% safe|completely safe|totally harmless)\b"),
             ("No 'chemical-free' claims (misleading)", "warning", r"\b(chemical[ -]free|no chemicals)\b"),
-            ("EPA certification must be accurate", "critical", r"\b(EPA certified|EPA approved)\b"),
+            ("EPA certification must be accurate", "critical", r"\b(epa certified|epa approved)\b"),
             ("Efficacy claims need qualification", "warning", r"\b(kills 99|eliminates all|destroys)\b"),
         ],
         "Haircare": [
@@ -197,16 +296,24 @@ def build_rules() -> dict[str, list[dict[str, Any]]]:
             ("Ingredient transparency required", "info", r"\b(natural|organic|pure)\b"),
         ],
     }
-    out: dict[str, list[dict[str, Any]]] = {}
+    # One fused pattern per category: each rule becomes a named group r<i>, so a
+    # single finditer pass finds every hit and m.lastgroup says which rule fired.
+    out: dict[str, dict[str, Any]] = {}
     for category, rows in raw_rules.items():
-        out[category] = [
-            {"rule": rule, "severity": severity, "regex": re.compile(pattern, re.IGNORECASE)}
-            for (rule, severity, pattern) in rows
-        ]
+        fused = "|".join(f"(?P<r{i}>{pattern})" for i, (_, _, pattern) in enumerate(rows))
+        out[category] = {
+            "regex": compile_rule_pattern(fused),
+            "rules": [{"rule": rule, "severity": severity, "pattern": pattern} for (rule, severity, pattern) in rows],
+        }
     return out
 
 
-COMPLIANCE_RULES = build_rules()
+@cache
+def _rules() -> dict[str, dict[str, Any]]:
+    # Built on first use rather than at import, keeping pattern compilation off
+    # the cold-start path of the first Streamlit render.
+    return build_rules()
+
 
 CHANNELS = [
     {"id": "instagram", "name": "Instagram Post", "maxLength": 2200, "format": "Visual-first caption with hashtags"},
@@ -219,17 +326,289 @@ CHANNELS = [
     {"id": "sms", "name": "SMS/WhatsApp", "maxLength": 160, "format": "Short promotional message"},
 ]
 
+# Sidebar lookups, built once at import instead of on every Streamlit rerun.
+PRODUCT_OPTIONS = MappingProxyType({p.label: p for p in PRODUCT_DATABASE})
+PRODUCT_LABELS = tuple(PRODUCT_OPTIONS)
+CHANNEL_OPTIONS = MappingProxyType({c["name"]: c for c in CHANNELS})
+
 CAMPAIGN_TONES = ["Professional", "Playful", "Urgent", "Inspirational", "Educational", "Luxurious", "Eco-Conscious", "Bold & Edgy"]
 
 
-def check_compliance(text: str, category: str) -> list[dict[str, Any]]:
-    issues: list[dict[str, Any]] = []
-    for rule in COMPLIANCE_RULES.get(category, []):
-        matches = rule["regex"].findall(text)
-        if matches:
-            unique_matches = sorted(set(matches if isinstance(matches, list) else [matches]))
-            issues.append({"rule": rule["rule"], "severity": rule["severity"], "matches": unique_matches})
-    return issues
+def check_compliance(text: str, category: str, stop_on_critical: bool = False) -> list[dict[str, Any]]:
+    """Return the rules text trips, each with its sorted unique matches.
+
+    stop_on_critical is for callers that only need get_compliance_score: the scan
+    ends at the first critical hit in the text and returns just that issue. A
+    result without a critical issue is still the complete list.
+    """
+    if not text.strip():
+        return []
+    # Fresh dicts and match lists: callers keep issues in session state, and the
+    # cached entries are shared by every session.
+    return [
+        {**issue, "matches": list(issue["matches"])}
+        for issue in _check_compliance_cached(text, category, stop_on_critical)
+    ]
+
+
+@lru_cache(maxsize=1024)
+def _check_compliance_cached(text: str, category: str, stop_on_critical: bool = False) -> tuple[dict[str, Any], ...]:
+    compiled = _rules().get(category)
+    if compiled is None:
+        return ()
+    rules = compiled["rules"]
+    buckets: list[set[str]] = [set() for _ in rules]
+    for m in _scan_lowered(compiled["regex"], text):
+        idx = int(m.lastgroup[1:])
+        found = text[m.start() : m.end()]
+        if stop_on_critical and rules[idx]["severity"] == "critical":
+            return ({"rule": rules[idx]["rule"], "severity": "critical", "matches": (found,)},)
+        buckets[idx].add(found)
+    return tuple(
+        {"rule": rule["rule"], "severity": rule["severity"], "matches": tuple(sorted(found))}
+        for rule, found in zip(rules, buckets)
+        if found
+    )
+
+
+@cache
+def _super_rules() -> tuple[re.Pattern[str], list[tuple[str, str, int]]]:
+    """One pattern covering every category, for scoring a text against all of them.
+
+    A leading lookahead lets the engine skip ahead to positions where some rule
+    matches; there, one optional lookahead per category captures the rule that
+    category's own fused pattern would pick (leftmost-first, in rule order).
+    Returns the compiled pattern and (group name, category, rule index) triples.
+    """
+    rules = _rules()
+    groups: list[tuple[str, str, int]] = []
+    per_category: list[str] = []
+    for j, (category, compiled) in enumerate(rules.items()):
+        alternatives = []
+        for i, rule in enumerate(compiled["rules"]):
+            groups.append((f"c{j}_r{i}", category, i))
+            alternatives.append(f"(?P<c{j}_r{i}>{rule['pattern']})")
+        per_category.append(f"(?:(?={'|'.join(alternatives)})|)")
+    any_rule = "|".join(rule["pattern"] for compiled in rules.values() for rule in compiled["rules"])
+    return re.compile(f"(?=(?:{any_rule})){''.join(per_category)}"), groups
+
+
+def bulk_check_compliance(text: str) -> dict[str, list[dict[str, Any]]]:
+    """check_compliance against every category in a single pass over text."""
+    rules = _rules()
+    if not text.strip():
+        return {category: [] for category in rules}
+    pattern, groups = _super_rules()
+    buckets = {category: [set() for _ in compiled["rules"]] for category, compiled in rules.items()}
+    # Per-category end of the last accepted hit: each category keeps finditer's
+    # non-overlapping semantics even where categories' matches overlap.
+    last_end = dict.fromkeys(rules, 0)
+    for m in _scan_lowered(pattern, text):
+        for name, category, idx in groups:
+            start, end = m.span(name)
+            if start >= 0 and m.start() >= last_end[category]:
+                buckets[category][idx].add(text[start:end])
+                last_end[category] = end
+    return {
+        category: [
+            {"rule": rule["rule"], "severity": rule["severity"], "matches": sorted(found)}
+            for rule, found in zip(rules[category]["rules"], buckets[category])
+            if found
+        ]
+        for category in rules
+    }
+
+
+# Below this many texts the regex path wins; the literal scanner only pays off
+# for bulk scoring.
+BATCH_SCAN_MIN = 64
+
+_LITERAL_RULE = re.compile(r"\\b\((.+)\)\\b")
+_LITERAL_ATOM = re.compile(r"(\[[^\]\\]+\]|[^\\()\[\]|?*+{}.^$])(\?)?")
+
+
+def _expand_literals(pattern: str) -> list[str] | None:
+    """Expand a rule like ``\\b(prevents?|chemical[ -]free)\\b`` into its literals.
+
+    Literals come out in the order the regex engine tries them (alternatives left
+    to right, optional characters taken first). Returns None when the pattern
+    uses anything beyond literal characters, ``?`` and character classes.
+    """
+    outer = _LITERAL_RULE.fullmatch(pattern)
+    if outer is None:
+        return None
+    literals: list[str] = []
+    for alternative in outer.group(1).split("|"):
+        atoms = _LITERAL_ATOM.findall(alternative)
+        if "".join(atom + optional for atom, optional in atoms) != alternative:
+            return None
+        expanded = [""]
+        for atom, optional in atoms:
+            choices = list(atom[1:-1]) if atom.startswith("[") else [atom]
+            if optional:
+                choices.append("")
+            expanded = [prefix + choice for prefix in expanded for choice in choices]
+        literals.extend(literal.lower() for literal in expanded)
+    return literals
+
+
+def _scan(
+    cps: np.ndarray,
+    word: np.ndarray,
+    delta: np.ndarray,
+    out_ptr: np.ndarray,
+    out_ids: np.ndarray,
+    pat_len: np.ndarray,
+    hits: np.ndarray,
+) -> int:
+    """Aho-Corasick pass over lowercased code points, keeping ``\\b``-bounded hits.
+
+    Code points >= 128 share one column of the transition table since every
+    pattern is ASCII. Writes (start, end, pattern id) rows into hits while there
+    is room and returns the total number of hits, so a call with an empty hits
+    array just counts them.
+    """
+    n_hits = 0
+    state = 0
+    size = cps.shape[0]
+    for i in range(size):
+        c = cps[i]
+        state = delta[state, c if c < 128 else 128]
+        for k in range(out_ptr[state], out_ptr[state + 1]):
+            pid = out_ids[k]
+            start = i + 1 - pat_len[pid]
+            before = word[start - 1] if start > 0 else 0
+            after = word[i + 1] if i + 1 < size else 0
+            if before != word[start] and word[i] != after:
+                if n_hits < hits.shape[0]:
+                    hits[n_hits, 0] = start
+                    hits[n_hits, 1] = i + 1
+                    hits[n_hits, 2] = pid
+                n_hits += 1
+    return n_hits
+
+
+def _leftmost_first(hits: np.ndarray) -> np.ndarray:
+    """Mask of hits finditer would keep: hits arrive sorted by (start, priority)."""
+    keep = np.zeros(hits.shape[0], dtype=np.bool_)
+    pos = 0
+    for k in range(hits.shape[0]):
+        if hits[k, 0] >= pos:
+            keep[k] = True
+            pos = hits[k, 1]
+    return keep
+
+
+if numba is not None:
+    _scan = numba.njit(cache=True)(_scan)
+    _leftmost_first = numba.njit(cache=True)(_leftmost_first)
+    _ASCII_WORD = np.array([chr(c).isalnum() or c == 95 for c in range(128)], dtype=np.uint8)
+
+
+@cache
+def _batch_scanner(category: str) -> dict[str, Any] | None:
+    """Compile a category's rules into a flat DFA for _scan, or None if any rule isn't literal."""
+    compiled = _rules().get(category)
+    if compiled is None:
+        return None
+    literals: list[str] = []
+    literal_rule: list[int] = []
+    for idx, rule in enumerate(compiled["rules"]):
+        expanded = _expand_literals(rule["pattern"])
+        if expanded is None:
+            return None
+        literals.extend(expanded)
+        literal_rule.extend([idx] * len(expanded))
+
+    goto: list[dict[int, int]] = [{}]
+    outputs: list[list[int]] = [[]]
+    for pid, literal in enumerate(literals):
+        state = 0
+        for ch in literal.encode("ascii"):
+            if ch not in goto[state]:
+                goto[state][ch] = len(goto)
+                goto.append({})
+                outputs.append([])
+            state = goto[state][ch]
+        outputs[state].append(pid)
+
+    delta = np.zeros((len(goto), 129), dtype=np.int32)
+    fail = [0] * len(goto)
+    queue = list(goto[0].values())
+    for ch, nxt in goto[0].items():
+        delta[0, ch] = nxt
+    for state in queue:
+        delta[state] = delta[fail[state]]
+        outputs[state] = outputs[state] + outputs[fail[state]]
+        for ch, nxt in goto[state].items():
+            fail[nxt] = delta[fail[state], ch]
+            delta[state, ch] = nxt
+            queue.append(nxt)
+
+    out_ptr = np.zeros(len(goto) + 1, dtype=np.int64)
+    out_ptr[1:] = np.cumsum([len(o) for o in outputs])
+    return {
+        "delta": delta,
+        "out_ptr": out_ptr,
+        "out_ids": np.array([pid for o in outputs for pid in o], dtype=np.int64),
+        "pat_len": np.array([len(literal) for literal in literals], dtype=np.int64),
+        "literal_rule": literal_rule,
+    }
+
+
+def check_compliance_batch(texts: list[str], category: str) -> list[list[dict[str, Any]]]:
+    """check_compliance over many texts in one JIT-compiled literal scan.
+
+    Small batches, a missing numba install or non-literal rules fall back to
+    the per-text regex path, as does any text whose lower() changes its length.
+    """
+    scanner = _batch_scanner(category) if numba is not None and len(texts) >= BATCH_SCAN_MIN else None
+    if scanner is None:
+        return [check_compliance(text, category) for text in texts]
+
+    # lower() can expand a character ("İ" -> "i̇"). check_compliance matches such
+    # texts case-insensitively on the original, where "İ" still matches "i", so
+    # they take that path and are left out of the scan buffer.
+    lowered_texts = [text.lower() for text in texts]
+    fallback = {t for t, (text, lc) in enumerate(zip(texts, lowered_texts)) if len(lc) != len(text)}
+    for t in fallback:
+        lowered_texts[t] = ""
+
+    # One newline-joined buffer: the separator is a non-word character no rule
+    # contains, so matches never span two texts and \b behaves as at string ends.
+    lowered = "\n".join(lowered_texts)
+    offsets = np.cumsum([0] + [len(lc) + 1 for lc in lowered_texts])
+
+    cps = np.frombuffer(lowered.encode("utf-32-le"), dtype=np.uint32)
+    word = _ASCII_WORD[np.minimum(cps, 127)]
+    for i in np.flatnonzero(cps >= 128):
+        word[i] = lowered[i].isalnum()
+
+    tables = (scanner["delta"], scanner["out_ptr"], scanner["out_ids"], scanner["pat_len"])
+    # Counting pass first, so hits is sized to the matches actually found.
+    hits = np.empty((_scan(cps, word, *tables, np.empty((0, 3), dtype=np.int64)), 3), dtype=np.int64)
+    _scan(cps, word, *tables, hits)
+    # Literal ids follow regex priority, so (start, id) order reproduces finditer's
+    # leftmost-first, non-overlapping choice.
+    hits = hits[np.lexsort((hits[:, 2], hits[:, 0]))]
+    hits = hits[_leftmost_first(hits)]
+    text_ids = np.searchsorted(offsets, hits[:, 0], side="right") - 1
+    hits[:, :2] -= offsets[text_ids, None]
+
+    rules = _rules()[category]["rules"]
+    buckets: list[list[set[str]]] = [[set() for _ in rules] for _ in texts]
+    for t, (start, end, pid) in zip(text_ids.tolist(), hits.tolist()):
+        buckets[t][scanner["literal_rule"][pid]].add(texts[t][start:end])
+    return [
+        check_compliance(texts[t], category)
+        if t in fallback
+        else [
+            {"rule": rule["rule"], "severity": rule["severity"], "matches": sorted(found)}
+            for rule, found in zip(rules, text_buckets)
+            if found
+        ]
+        for t, text_buckets in enumerate(buckets)
+    ]
 
 
 def get_compliance_score(issues: list[dict[str, Any]]) -> str:
@@ -244,88 +623,249 @@ def get_compliance_score(issues: list[dict[str, Any]]) -> str:
 
 
 def strip_json_fence(text: str) -> str:
-    return re.sub(r"```json|```", "", text).strip()
+    text = text.strip()
+    if not text.startswith("```"):
+        return text
+    text = text[7:] if text.startswith("```json") else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
 
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
 
-def openai_chat_completion(payload: dict[str, Any]) -> dict[str, Any]:
+# Output budget per channel, and the most a combined request may ask for: 4096
+# is the output limit of older chat models (gpt-4, gpt-4-turbo, gpt-3.5-turbo).
+CHANNEL_MAX_TOKENS = 1200
+MAX_COMPLETION_TOKENS = 4096
+CHANNELS_PER_REQUEST = MAX_COMPLETION_TOKENS // CHANNEL_MAX_TOKENS
+
+# Caps concurrent OpenAI requests when channels are generated in parallel.
+OPENAI_CONCURRENCY = threading.Semaphore(4)
+
+# Shared session so repeated calls reuse pooled keep-alive connections instead
+# of paying a fresh TCP + TLS handshake each time.
+_SESSION = requests.Session()
+_SESSION.headers.update({"Content-Type": "application/json"})
+
+
+if msgspec is not None:
+
+    class _Delta(msgspec.Struct):
+        content: str | None = None
+
+    class _StreamChoice(msgspec.Struct):
+        delta: _Delta = msgspec.field(default_factory=_Delta)
+        finish_reason: str | None = None
+
+    class _StreamChunk(msgspec.Struct):
+        choices: list[_StreamChoice] = []
+        error: Any = None
+
+    # Decodes straight into slotted structs, skipping the fields we never read.
+    _CHUNK_DECODER = msgspec.json.Decoder(_StreamChunk)
+
+# What a malformed event raises while decoding: bad JSON, or JSON of the wrong
+# shape (msgspec's ValidationError; AttributeError/TypeError on the dict path).
+_CHUNK_ERRORS = (json.JSONDecodeError, AttributeError, TypeError) + (
+    (msgspec.MsgspecError,) if msgspec is not None else ()
+)
+
+
+def _decode_chunk(data: bytes) -> tuple[list[str], list[str]]:
+    """Content pieces and finish reasons carried by one streamed chat.completion.chunk event.
+
+    An in-stream error event or a malformed chunk raises RuntimeError.
+    """
+    try:
+        if msgspec is not None:
+            chunk = _CHUNK_DECODER.decode(data)
+            error = chunk.error
+            choices = [(c.delta.content, c.finish_reason) for c in chunk.choices]
+        else:
+            parsed = json_loads(data)
+            error = parsed.get("error")
+            choices = [
+                ((c.get("delta") or {}).get("content"), c.get("finish_reason")) for c in parsed.get("choices") or []
+            ]
+            if not all(isinstance(text, (str, type(None))) for text, _ in choices):
+                raise TypeError("delta content is not a string")
+    except _CHUNK_ERRORS as e:
+        raise RuntimeError(f"Malformed streamed chunk from OpenAI: {e}") from e
+    if error is not None:
+        message = error.get("message", error) if isinstance(error, dict) else error
+        raise RuntimeError(f"OpenAI stream failed: {message}")
+    return [text for text, _ in choices if text], [reason for _, reason in choices if reason]
+
+
+def _openai_error(resp: requests.Response) -> RuntimeError:
+    body = resp.text
+    try:
+        parsed = json_loads(body)
+        message = parsed.get("error", {}).get("message", body)
+    except json.JSONDecodeError:
+        message = body
+    return RuntimeError(f"OpenAI request failed ({resp.status_code}): {message}")
+
+
+def openai_chat_completion(
+    payload: dict[str, Any],
+    on_delta: Callable[[str], None] | None = None,
+) -> dict[str, Any]:
+    """Stream a chat completion and return it in the non-streaming response shape.
+
+    Content arrives as server-sent events; each text chunk is passed to on_delta
+    as it lands so callers can report progress before the response completes.
+    Raises RuntimeError on an error event, a response cut off at max_tokens, or a
+    stream that ends without its [DONE] marker.
+    """
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is missing. Add it in .env or your shell environment.")
 
-    req = urllib.request.Request(
-        url="https://api.openai.com/v1/chat/completions",
-        method="POST",
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        },
-    )
+    chunks: list[str] = []
+    done = False
     try:
-        with urllib.request.urlopen(req, timeout=90) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8", errors="replace")
-        try:
-            parsed = json.loads(body)
-            message = parsed.get("error", {}).get("message", body)
-        except json.JSONDecodeError:
-            message = body
-        raise RuntimeError(f"OpenAI request failed ({e.code}): {message}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Network error while calling OpenAI: {e.reason}") from e
+        with OPENAI_CONCURRENCY, _SESSION.post(
+            OPENAI_CHAT_URL,
+            data=json_dumps({**payload, "stream": True}),
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=90,
+            stream=True,
+        ) as resp:
+            if not resp.ok:
+                raise _openai_error(resp)
+            for line in resp.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    done = True
+                    break
+                texts, finish_reasons = _decode_chunk(data)
+                for text in texts:
+                    chunks.append(text)
+                    if on_delta is not None:
+                        on_delta(text)
+                if "length" in finish_reasons:
+                    raise RuntimeError("OpenAI response was cut off at max_tokens.")
+    except requests.RequestException as e:
+        raise RuntimeError(f"Network error while calling OpenAI: {e}") from e
+    if not done:
+        raise RuntimeError("OpenAI stream ended before the [DONE] marker.")
+    return {"choices": [{"message": {"role": "assistant", "content": "".join(chunks)}}]}
+
+
+@lru_cache(maxsize=16)
+def _rules_text(category: str) -> str:
+    category_rules = _rules().get(category, {}).get("rules", [])
+    return "\n".join([f"- {r['severity'].upper()}: {r['rule']}" for r in category_rules])
+
+
+_VARIANT_SCHEMA = """{
+  "label": "Variant A label",
+  "headline": "attention-grabbing headline",
+  "body": "the main marketing copy",
+  "cta": "call to action",
+  "hashtags": ["tag1", "tag2"],
+  "complianceNotes": "any compliance considerations"
+}"""
+
+SINGLE_CHANNEL_SCHEMA = '{\n  "variants": [\n' + indent(_VARIANT_SCHEMA, " " * 4) + "\n  ]\n}"
+MULTI_CHANNEL_SCHEMA = (
+    '{\n  "channels": {\n    "<channel id>": [\n' + indent(_VARIANT_SCHEMA, " " * 6) + "\n    ]\n  }\n}"
+)
+
+
+@lru_cache(maxsize=64)
+def _system_prompt(brand_key: str, category: str, multi_channel: bool = False) -> str:
+    brand = BRAND_STYLE_GUIDES[brand_key]
+    return f"""You are an expert CPG marketing copywriter. You produce high-converting, brand-compliant marketing content.
+
+BRAND VOICE GUIDE for "{brand_key}":
+- Tone: {brand.tone}
+- Voice Traits: {", ".join(brand.voiceTraits)}
+- Preferred Words: {", ".join(brand.doWords)}
+- Avoid These Words: {", ".join(brand.dontWords)}
+- Brand Tagline: {brand.tagline}
+
+COMPLIANCE RULES for {category}:
+{_rules_text(category)}
+
+You MUST respond ONLY with valid JSON. No markdown and no code fences.
+Schema:
+{MULTI_CHANNEL_SCHEMA if multi_channel else SINGLE_CHANNEL_SCHEMA}"""
+
+
+# Top-level key each response must carry, and its JSON type.
+_RESULT_TYPES = {"variants": list, "channels": dict}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_generate(
+    payload_json: bytes, result_key: str, _on_delta: Callable[[str], None] | None = None
+) -> dict[str, Any]:
+    # Keyed on the canonical (sorted-key) payload, so identical regenerate clicks
+    # are served from cache instead of re-issuing a paid API call. The leading
+    # underscore keeps the progress callback out of the cache key. The response is
+    # parsed and validated here: a truncated or malformed one raises, and
+    # st.cache_data never caches an exception, so the next click asks again.
+    data = openai_chat_completion(json_loads(payload_json), on_delta=_on_delta)
+    content = data["choices"][0]["message"]["content"]
+    parsed = json_loads(strip_json_fence(content))
+    expected = _RESULT_TYPES[result_key]
+    if not isinstance(parsed, dict) or not isinstance(parsed.get(result_key), expected):
+        kind = "array" if expected is list else "object"
+        raise RuntimeError(f"Model response did not include a valid '{result_key}' {kind}.")
+    return parsed
+
+
+def _product_brief(product: Product) -> str:
+    return f"""PRODUCT: {product.name}
+CATEGORY: {product.category}
+FEATURES: {", ".join(product.features)}
+BENEFITS: {", ".join(product.benefits)}
+USAGE: {product.usage}
+TARGET AUDIENCE: {product.targetAudience}
+PRICE: {product.pricePoint}
+USP: {product.usp}"""
+
+
+def _request_json(
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    max_tokens: int,
+    result_key: str,
+    on_delta: Callable[[str], None] | None,
+) -> dict[str, Any]:
+    payload = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"},
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+    }
+    return _cached_generate(json_dumps(payload, sort_keys=True), result_key, on_delta)
 
 
 def generate_for_channel(
-    product: dict[str, Any],
+    product: Product,
     channel: dict[str, Any],
     tone: str,
     season: str,
     num_variants: int,
     custom_prompt: str,
     model: str,
+    on_delta: Callable[[str], None] | None = None,
 ) -> list[dict[str, Any]]:
-    brand = BRAND_STYLE_GUIDES[product["brand"]]
-    category_rules = COMPLIANCE_RULES.get(product["category"], [])
-    rules_text = "\n".join([f"- {r['severity'].upper()}: {r['rule']}" for r in category_rules])
-
-    system_prompt = f"""You are an expert CPG marketing copywriter. You produce high-converting, brand-compliant marketing content.
-
-BRAND VOICE GUIDE for "{product['brand']}":
-- Tone: {brand['tone']}
-- Voice Traits: {", ".join(brand['voiceTraits'])}
-- Preferred Words: {", ".join(brand['doWords'])}
-- Avoid These Words: {", ".join(brand['dontWords'])}
-- Brand Tagline: {brand['tagline']}
-
-COMPLIANCE RULES for {product['category']}:
-{rules_text}
-
-You MUST respond ONLY with valid JSON. No markdown and no code fences.
-Schema:
-{{
-  "variants": [
-    {{
-      "label": "Variant A label",
-      "headline": "attention-grabbing headline",
-      "body": "the main marketing copy",
-      "cta": "call to action",
-      "hashtags": ["tag1", "tag2"],
-      "complianceNotes": "any compliance considerations"
-    }}
-  ]
-}}"""
+    system_prompt = _system_prompt(product.brand, product.category)
 
     user_prompt = f"""Create {num_variants} distinct marketing content variants for:
 
-PRODUCT: {product['name']}
-CATEGORY: {product['category']}
-FEATURES: {", ".join(product['features'])}
-BENEFITS: {", ".join(product['benefits'])}
-USAGE: {product['usage']}
-TARGET AUDIENCE: {product['targetAudience']}
-PRICE: {product['pricePoint']}
-USP: {product['usp']}
+{_product_brief(product)}
 
 CHANNEL: {channel['name']}
 FORMAT: {channel['format']}
@@ -336,73 +876,141 @@ SEASON/OCCASION: {season}
 
 Each variant should use a different creative angle and be useful for A/B testing."""
 
-    payload = {
-        "model": model,
-        "max_tokens": 1200,
-        "response_format": {"type": "json_object"},
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+    return _request_json(system_prompt, user_prompt, model, CHANNEL_MAX_TOKENS, "variants", on_delta)["variants"]
+
+
+def generate_for_all_channels(
+    product: Product,
+    channels: list[dict[str, Any]],
+    tone: str,
+    season: str,
+    num_variants: int,
+    custom_prompt: str,
+    model: str,
+    on_delta: Callable[[str], None] | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    """Generate variants for several channels in a single request.
+
+    Returns variants keyed by channel id. Channels the model skipped or returned
+    malformed are left out (as is everything if the request fails or the JSON
+    doesn't parse, e.g. a response cut off at max_tokens) so the caller can retry
+    them one by one. Pass at most CHANNELS_PER_REQUEST channels.
+    """
+    system_prompt = _system_prompt(product.brand, product.category, multi_channel=True)
+    channel_lines = "\n".join(
+        f"- {c['name']} (id={c['id']}): FORMAT: {c['format']}; MAX LENGTH: {c['maxLength']} characters" for c in channels
+    )
+
+    user_prompt = f"""Create {num_variants} distinct marketing content variants for EACH channel below:
+
+{_product_brief(product)}
+
+CHANNELS:
+{channel_lines}
+CAMPAIGN TONE: {tone}
+SEASON/OCCASION: {season}
+{f"ADDITIONAL DIRECTION: {custom_prompt}" if custom_prompt else ""}
+
+Return each channel's variants under "channels", keyed by the channel id.
+Each variant should use a different creative angle and be useful for A/B testing."""
+
+    max_tokens = min(CHANNEL_MAX_TOKENS * len(channels), MAX_COMPLETION_TOKENS)
+    try:
+        by_channel = _request_json(system_prompt, user_prompt, model, max_tokens, "channels", on_delta)["channels"]
+    except (json.JSONDecodeError, RuntimeError):
+        return {}
+    return {
+        c["id"]: by_channel[c["id"]]
+        for c in channels
+        if isinstance(by_channel.get(c["id"]), list) and by_channel[c["id"]]
     }
-    data = openai_chat_completion(payload)
-    content = data["choices"][0]["message"]["content"]
-    if isinstance(content, list):
-        content = "".join([item.get("text", "") for item in content if isinstance(item, dict)])
-    parsed = json.loads(strip_json_fence(content))
-    variants = parsed.get("variants", [])
-    if not isinstance(variants, list):
-        raise RuntimeError("Model response did not include a valid 'variants' array.")
-    return variants
 
 
-def build_txt_export(product: dict[str, Any], results: list[dict[str, Any]]) -> str:
-    lines = [
-        "CPG MARKETING CONTENT EXPORT",
-        f"Generated At: {dt.datetime.now().isoformat(timespec='seconds')}",
-        f"Product: {product['name']} ({product['brand']})",
-        f"Category: {product['category']}",
-        "",
-    ]
+CSV_FIELDS = ("channel", "label", "headline", "body", "cta", "hashtags", "complianceNotes", "complianceScore")
+
+
+# Trailing newline plus the join separator leaves a blank line between variants.
+TXT_VARIANT_TMPL = (
+    "Variant {i}: {label}\n"
+    "Headline: {headline}\n"
+    "Body: {body}\n"
+    "CTA: {cta}\n"
+    "Hashtags: {hashtags}\n"
+    "Compliance Notes: {complianceNotes}\n"
+)
+
+
+class _BlankDefault(dict):
+    """format_map mapping that renders missing variant fields as empty strings."""
+
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+def _iter_lines(product: Product, results: list[dict[str, Any]]) -> Iterator[str]:
+    yield "CPG MARKETING CONTENT EXPORT"
+    yield f"Generated At: {dt.datetime.now().isoformat(timespec='seconds')}"
+    yield f"Product: {product.label}"
+    yield f"Category: {product.category}"
+    yield ""
     for row in results:
-        lines.append(f"Channel: {row['channel_name']}")
-        lines.append("-" * 60)
+        yield f"Channel: {row['channel_name']}"
+        yield "-" * 60
         for i, v in enumerate(row["variants"], start=1):
-            lines.append(f"Variant {i}: {v.get('label', '')}")
-            lines.append(f"Headline: {v.get('headline', '')}")
-            lines.append(f"Body: {v.get('body', '')}")
-            lines.append(f"CTA: {v.get('cta', '')}")
-            lines.append(f"Hashtags: {', '.join(v.get('hashtags', []))}")
-            lines.append(f"Compliance Notes: {v.get('complianceNotes', '')}")
-            lines.append("")
-        lines.append("")
-    return "\n".join(lines)
+            yield TXT_VARIANT_TMPL.format_map(_BlankDefault(v, i=i, hashtags=", ".join(v.get("hashtags", []))))
+        yield ""
+
+
+def build_txt_export(product: Product, results: list[dict[str, Any]]) -> str:
+    return "\n".join(_iter_lines(product, results))
 
 
 def build_csv_export(results: list[dict[str, Any]]) -> str:
     buf = io.StringIO()
-    writer = csv.DictWriter(
-        buf,
-        fieldnames=["channel", "label", "headline", "body", "cta", "hashtags", "complianceNotes", "complianceScore"],
+    writer = csv.writer(buf)
+    writer.writerow(CSV_FIELDS)
+    writer.writerows(
+        (
+            row["channel_name"],
+            v.get("label", ""),
+            v.get("headline", ""),
+            v.get("body", ""),
+            v.get("cta", ""),
+            ", ".join(v.get("hashtags", [])),
+            v.get("complianceNotes", ""),
+            v.get("_compliance_score", ""),
+        )
+        for row in results
+        for v in row["variants"]
     )
-    writer.writeheader()
-    for row in results:
-        for v in row["variants"]:
-            writer.writerow(
-                {
-                    "channel": row["channel_name"],
-                    "label": v.get("label", ""),
-                    "headline": v.get("headline", ""),
-                    "body": v.get("body", ""),
-                    "cta": v.get("cta", ""),
-                    "hashtags": ", ".join(v.get("hashtags", [])),
-                    "complianceNotes": v.get("complianceNotes", ""),
-                    "complianceScore": v.get("_compliance_score", ""),
-                }
-            )
     return buf.getvalue()
 
 
+def _compliance_text(variant: dict[str, Any]) -> str:
+    return f"{variant.get('headline', '')} {variant.get('body', '')} {variant.get('cta', '')}"
+
+
+def _render_variant(variant: dict[str, Any]) -> str:
+    # Built once when the variant is generated; Streamlit reruns the whole script
+    # on every widget interaction, so reruns just emit the stored markdown.
+    lines = [
+        f"**Headline:** {variant.get('headline', '')}",
+        f"**Body:** {variant.get('body', '')}",
+        f"**CTA:** {variant.get('cta', '')}",
+        f"**Hashtags:** {', '.join(variant.get('hashtags', []))}",
+        f"**Compliance Notes:** {variant.get('complianceNotes', '')}",
+        f"**Compliance Score:** {variant.get('_compliance_score', 'Compliant')}",
+    ]
+    issues = variant.get("_compliance_issues", [])
+    if issues:
+        lines.extend(
+            f"- [{issue['severity'].upper()}] {issue['rule']} | matches: {', '.join(issue['matches'])}" for issue in issues
+        )
+    else:
+        lines.append("- No compliance issues detected by regex checks.")
+    return "\n\n".join(lines)
+
+
 def main() -> None:
     st.set_page_config(page_title="CPG Content Generator", layout="wide")
     st.title("CPG Content Generator")
@@ -411,15 +1019,12 @@ def main() -> None:
     if "results" not in st.session_state:
         st.session_state.results = []
 
-    product_options = {f"{p['name']} ({p['brand']})": p for p in PRODUCT_DATABASE}
-    channel_options = {c["name"]: c for c in CHANNELS}
-
     with st.sidebar:
         st.header("Campaign Setup")
-        selected_product_label = st.selectbox("Product", list(product_options.keys()))
+        selected_product_label = st.selectbox("Product", PRODUCT_LABELS)
         selected_channel_labels = st.multiselect(
             "Channels",
-            list(channel_options.keys()),
+            list(CHANNEL_OPTIONS),
             default=["Instagram Post"],
         )
         campaign_tone = st.selectbox("Campaign Tone", CAMPAIGN_TONES, index=0)
@@ -429,7 +1034,7 @@ def main() -> None:
         custom_prompt = st.text_area("Additional direction", value="")
         generate_clicked = st.button("Generate Content", type="primary")
 
-    selected_product = product_options[selected_product_label]
+    selected_product = PRODUCT_OPTIONS[selected_product_label]
 
     if generate_clicked:
         if not selected_channel_labels:
@@ -438,28 +1043,67 @@ def main() -> None:
             results: list[dict[str, Any]] = []
             progress = st.progress(0)
             status = st.empty()
-            selected_channels = [channel_options[name] for name in selected_channel_labels]
+            selected_channels = [CHANNEL_OPTIONS[name] for name in selected_channel_labels]
             try:
-                for i, channel in enumerate(selected_channels, start=1):
-                    status.write(f"Generating {channel['name']} ({i}/{len(selected_channels)}) ...")
-                    variants = generate_for_channel(
-                        product=selected_product,
-                        channel=channel,
-                        tone=campaign_tone,
-                        season=target_season,
-                        num_variants=num_variants,
-                        custom_prompt=custom_prompt,
-                        model=model,
+                # Characters streamed so far, written by worker threads.
+                received = 0
+
+                def on_delta(text: str) -> None:
+                    nonlocal received
+                    received += len(text)
+
+                generated: dict[str, list[dict[str, Any]]] = {}
+                futures: dict[str, Future[list[dict[str, Any]]]] = {}
+
+                def await_futures(pending: set[Future[Any]]) -> None:
+                    while pending:
+                        _, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                        ready = len(generated) + sum(f.done() for f in futures.values())
+                        status.write(
+                            f"Generated {ready}/{len(selected_channels)} channel(s) ... {received} characters received"
+                        )
+                        progress.progress(ready / len(selected_channels))
+
+                options = dict(
+                    product=selected_product,
+                    tone=campaign_tone,
+                    season=target_season,
+                    num_variants=num_variants,
+                    custom_prompt=custom_prompt,
+                    model=model,
+                    on_delta=on_delta,
+                )
+                with ThreadPoolExecutor(max_workers=len(selected_channels)) as executor:
+                    # One request per batch of channels, kept under the output token
+                    # cap; any channel a batch misses is generated on its own below.
+                    batches = [
+                        selected_channels[i : i + CHANNELS_PER_REQUEST]
+                        for i in range(0, len(selected_channels), CHANNELS_PER_REQUEST)
+                    ]
+                    combined = [
+                        executor.submit(partial(generate_for_all_channels, channels=batch, **options))
+                        for batch in batches
+                        if len(batch) > 1
+                    ]
+                    await_futures(set(combined))
+                    for batch_future in combined:
+                        generated.update(batch_future.result())
+                    futures.update(
+                        (channel["id"], executor.submit(partial(generate_for_channel, channel=channel, **options)))
+                        for channel in selected_channels
+                        if channel["id"] not in generated
                     )
+                    await_futures(set(futures.values()))
+                for channel in selected_channels:
+                    variants = generated.get(channel["id"]) or futures[channel["id"]].result()
                     enriched: list[dict[str, Any]] = []
                     for v in variants:
-                        text = f"{v.get('headline', '')} {v.get('body', '')} {v.get('cta', '')}"
-                        issues = check_compliance(text, selected_product["category"])
+                        issues = check_compliance(_compliance_text(v), selected_product.category)
                         v["_compliance_issues"] = issues
                         v["_compliance_score"] = get_compliance_score(issues)
+                        v["_rendered_md"] = _render_variant(v)
                         enriched.append(v)
                     results.append({"channel_id": channel["id"], "channel_name": channel["name"], "variants": enriched})
-                    progress.progress(i / len(selected_channels))
                 st.session_state.results = results
                 status.success("Generation complete.")
             except Exception as err:
@@ -472,29 +1116,19 @@ def main() -> None:
             st.markdown(f"### {row['channel_name']}")
             for idx, variant in enumerate(row["variants"], start=1):
                 with st.expander(f"Variant {idx}: {variant.get('label', 'Untitled')}"):
-                    st.write(f"**Headline:** {variant.get('headline', '')}")
-                    st.write(f"**Body:** {variant.get('body', '')}")
-                    st.write(f"**CTA:** {variant.get('cta', '')}")
-                    st.write(f"**Hashtags:** {', '.join(variant.get('hashtags', []))}")
-                    st.write(f"**Compliance Notes:** {variant.get('complianceNotes', '')}")
-                    st.write(f"**Compliance Score:** {variant.get('_compliance_score', 'Compliant')}")
-                    issues = variant.get("_compliance_issues", [])
-                    if issues:
-                        for issue in issues:
-                            st.write(
-                                f"- [{issue['severity'].upper()}] {issue['rule']} | matches: {', '.join(issue['matches'])}"
-                            )
-                    else:
-                        st.write("- No compliance issues detected by regex checks.")
+                    st.markdown(variant["_rendered_md"])
 
         txt_data = build_txt_export(selected_product, results)
-        json_data = json.dumps(
+        json_data = json_dumps(
             {
                 "generatedAt": dt.datetime.now().isoformat(timespec="seconds"),
-                "product": selected_product,
-                "results": results,
+                "product": asdict(selected_product),
+                "results": [
+                    {**row, "variants": [{k: v for k, v in var.items() if k != "_rendered_md"} for var in row["variants"]]}
+                    for row in results
+                ],
             },
-            indent=2,
+            pretty=True,
         )
         csv_data = build_csv_export(results)
 
@@ -505,10 +1139,10 @@ def main() -> None:
 
     with st.expander("Product Library"):
         for p in PRODUCT_DATABASE:
-            st.markdown(f"**{p['name']}** ({p['brand']})")
-            st.write(f"Category: {p['category']}")
-            st.write(f"USP: {p['usp']}")
-            st.write(f"Price: {p['pricePoint']}")
+            st.markdown(f"**{p.name}** ({p.brand})")
+            st.write(f"Category: {p.category}")
+            st.write(f"USP: {p.usp}")
+            st.write(f"Price: {p.pricePoint}")
             st.write("---")
 
 
@@ -0,0 +1,190 @@
+import json
+import random
+import re
+from pathlib import Path
+
+import pytest
+import requests
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import cpg_app_1 as app
+
+CATEGORIES = sorted({p.category for p in app.PRODUCT_DATABASE})
+
+# Rule phrases in mixed case plus near misses and characters whose lower() or
+# isalnum() differs from ASCII: "İ" lowers to two code points, which shifts
+# every later offset in the lowered text, and inside a rule phrase ("İnstant")
+# only case-insensitive matching of the original text still finds it.
+WORDS = [
+    "cure", "CURE", "cures", "treats", "treats hair loss", "heal", "remedy", "guaranteed", "100%", "100% safe",
+    "always works", "permanent", "Clinically Proven", "dermatologist tested", "best", "#1", "x#1", "number one",
+    "superior to", "supports", "helps maintain", "prevents", "fights disease", "superfood", "miracle", "may contain",
+    "allergen", "high protein", "zero calorie", "certified organic", "completely safe", "totally harmless",
+    "chemical-free", "chemical free", "chemical_free", "no chemicals", "EPA certified", "EPA approved", "kills 99",
+    "kills 999", "eliminates all", "destroys", "forever", "cures dandruff", "medical", "instant", "overnight",
+    "zero risk", "doctor recommended", "medically approved", "all ages", "newborn", "natural", "organic", "pure",
+    "İ", "İnstant", "medİcal", "İMMEDİATE", "é", "naïve", "ß", "_", "9", "x", "caféorganic", "organicé", "100%x", "pure—",
+]
+SEPARATORS = [" ", "", "-", "—", ",", "\n", "'", "é", "_", ". "]
+
+
+def sample_texts(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    texts = [
+        "".join(rng.choice(WORDS) + rng.choice(SEPARATORS) for _ in range(rng.randint(0, 30))) for _ in range(count)
+    ]
+    return texts + ["", "   ", "İİcure", "İ cure İ", "CURE İİ guaranteed", "100% safe"]
+
+
+@pytest.mark.parametrize("category", CATEGORIES + ["Unknown"])
+def test_check_compliance_batch_matches_check_compliance(category):
+    pytest.importorskip("numba")
+    if app._batch_scanner(category) is None and category in CATEGORIES:
+        pytest.skip(f"{category} rules are not all literal; batch scan falls back to regex")
+    texts = sample_texts(2000, seed=14)
+    assert len(texts) >= app.BATCH_SCAN_MIN
+    assert app.check_compliance_batch(texts, category) == [app.check_compliance(t, category) for t in texts]
+
+
+def test_bulk_check_compliance_matches_check_compliance():
+    # Phrases shared by several categories ("100%", "organic", "pure", "cure")
+    # exercise the per-category non-overlap bookkeeping.
+    for text in sample_texts(2000, seed=21):
+        by_category = app.bulk_check_compliance(text)
+        assert set(by_category) == set(CATEGORIES)
+        for category in CATEGORIES:
+            assert by_category[category] == app.check_compliance(text, category), (category, text)
+
+
+@pytest.mark.parametrize("category", CATEGORIES)
+def test_stop_on_critical_keeps_the_score(category):
+    for text in sample_texts(500, seed=18):
+        full = app.check_compliance(text, category)
+        short = app.check_compliance(text, category, stop_on_critical=True)
+        assert app.get_compliance_score(short) == app.get_compliance_score(full)
+        if any(issue["severity"] == "critical" for issue in full):
+            assert len(short) == 1 and short[0]["severity"] == "critical"
+            assert short[0]["matches"][0] in next(i["matches"] for i in full if i["rule"] == short[0]["rule"])
+        else:
+            assert short == full
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ('{"variants": []}', '{"variants": []}'),
+        ('```json\n{"variants": []}\n```', '{"variants": []}'),
+        ('  ```\n{"a": "```"}\n```  ', '{"a": "```"}'),
+        ('```json\n{"a": 1}', '{"a": 1}'),
+    ],
+)
+def test_strip_json_fence(raw, expected):
+    assert app.strip_json_fence(raw) == expected
+
+
+class FakeStream:
+    """Stands in for the streamed requests.Response openai_chat_completion reads."""
+
+    ok = True
+    status_code = 200
+
+    def __init__(self, lines: list[bytes]):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+def sse(content: str, size: int = 16) -> list[bytes]:
+    events = [
+        b"data: " + json.dumps({"choices": [{"delta": {"content": content[i : i + size]}}]}).encode()
+        for i in range(0, len(content), size)
+    ]
+    return [b": keep-alive", *events, b"", b"data: [DONE]"]
+
+
+def variants(tag: str) -> list[dict[str, str]]:
+    return [{"label": f"{tag} A", "headline": "Radiance", "body": "Reveal skin", "cta": "Shop", "hashtags": []}]
+
+
+@pytest.fixture
+def openai(monkeypatch):
+    """Route every OpenAI call to a fake; set .respond(payload) -> SSE lines."""
+
+    class Fake:
+        calls: list[dict] = []
+
+        @staticmethod
+        def respond(payload):
+            return sse(json.dumps({"variants": variants("single")}))
+
+    def post(self, url, data=None, **kwargs):
+        payload = json.loads(data)
+        Fake.calls.append(payload)
+        return FakeStream(Fake.respond(payload))
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    # Patched on the class so the app module AppTest executes picks it up too.
+    monkeypatch.setattr(requests.Session, "post", post)
+    st.cache_data.clear()
+    yield Fake
+    st.cache_data.clear()
+
+
+def combined_ids(payload) -> list[str]:
+    return re.findall(r"\(id=([a-z_]+)\)", payload["messages"][1]["content"])
+
+
+def test_stream_reassembles_content(openai):
+    content = json.dumps({"variants": variants("x")})
+    openai.respond = lambda payload: sse(content, size=5)
+    pieces: list[str] = []
+    data = app.openai_chat_completion({"model": "m"}, on_delta=pieces.append)
+    assert data["choices"][0]["message"]["content"] == content
+    assert "".join(pieces) == content and len(pieces) > 1
+    assert openai.calls[0]["stream"] is True
+
+
+def test_combined_response_leaves_out_missing_channel(openai):
+    openai.respond = lambda payload: sse(json.dumps({"channels": {i: variants(i) for i in combined_ids(payload)[:-1]}}))
+    channels = app.CHANNELS[:3]
+    got = app.generate_for_all_channels(app.PRODUCT_DATABASE[0], channels, "Bold", "Summer", 1, "", "m")
+    assert list(got) == [c["id"] for c in channels[:2]]
+
+
+def test_truncated_combined_response_is_not_cached(openai):
+    openai.respond = lambda payload: sse('{"channels": {"instagram": [')
+    for _ in range(2):
+        assert app.generate_for_all_channels(app.PRODUCT_DATABASE[0], app.CHANNELS[:2], "Bold", "Summer", 1, "", "m") == {}
+    assert len(openai.calls) == 2
+
+
+@pytest.mark.parametrize("mode", ["missing channel", "truncated"])
+def test_app_falls_back_per_channel(openai, mode):
+    def respond(payload):
+        ids = combined_ids(payload)
+        if not ids:
+            return sse(json.dumps({"variants": variants("single")}))
+        if mode == "truncated":
+            return sse('{"channels": {')
+        return sse(json.dumps({"channels": {i: variants(i) for i in ids[:-1]}}))
+
+    openai.respond = respond
+    at = AppTest.from_file(str(Path(app.__file__)), default_timeout=30).run()
+    at.multiselect[0].set_value(["Instagram Post", "Email Campaign", "SMS/WhatsApp"]).run()
+    at.button[0].click().run()
+    assert not at.exception and not at.error
+    labels = [e.label for e in at.expander if e.label.startswith("Variant")]
+    if mode == "truncated":
+        assert labels == ["Variant 1: single A"] * 3
+        assert len(openai.calls) == 4
+    else:
+        assert labels == ["Variant 1: instagram A", "Variant 1: email A", "Variant 1: single A"]
+        assert len(openai.calls) == 2